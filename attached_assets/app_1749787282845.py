@@ -1,9 +1,14 @@
 
 import os
 import sys
+import errno
 import json
+import base64
+import re
+import struct
 import uuid
 import hashlib
+import mmap
 import datetime
 import secrets
 import logging
@@ -15,10 +20,20 @@ import zipfile
 import io
 import tempfile
 import shutil
+import atexit
+import collections
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 # Flask and extensions
-from flask import Flask, render_template, request, jsonify, session, redirect, url_for, flash, send_file, abort
+import click
+from flask import Flask, render_template, request, jsonify, session, redirect, url_for, flash, send_file, abort, has_request_context
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event, DDL, inspect
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import load_only
 from flask_migrate import Migrate
 from flask_wtf import FlaskForm, CSRFProtect
 from flask_wtf.file import FileField, FileAllowed, FileRequired
@@ -31,28 +46,34 @@ from flask_mail import Mail, Message
 # Security and encryption
 from werkzeug.security import generate_password_hash, check_password_hash
 from werkzeug.utils import secure_filename
-from cryptography.fernet import Fernet
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
 import jwt
 import pyotp
-import qrcode
-from PIL import Image
 
 # File processing
-import textract
-from elasticsearch import Elasticsearch
+from elasticsearch import Elasticsearch, helpers
+from elastic_transport import JsonSerializer
 import redis
 
+try:
+    import orjson
+except ImportError:  # optional; the stdlib json module is used instead
+    orjson = None
+
+try:
+    import blake3
+except ImportError:  # optional; new checksums use SHA-256 instead
+    blake3 = None
+
 # Form handling
 from wtforms import StringField, PasswordField, BooleanField, TextAreaField, SelectField, HiddenField
 from wtforms.validators import DataRequired, Email, Length, ValidationError
 
 # Background tasks
-from celery import Celery
+from celery import Celery, group
 
 # Monitoring and logging
 from logging.handlers import RotatingFileHandler
-import sentry_sdk
-from sentry_sdk.integrations.flask import FlaskIntegration
 
 # Initialize Flask app
 app = Flask(__name__)
@@ -62,10 +83,19 @@ app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', secrets.token_urlsafe(32
 app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL', 'sqlite:///efms.db')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+    'pool_size': int(os.environ.get('DATABASE_POOL_SIZE', 20)),
+    'max_overflow': int(os.environ.get('DATABASE_MAX_OVERFLOW', 20)),
+    'pool_timeout': 10,
     'pool_pre_ping': True,
-    'pool_recycle': 300,
+    'pool_recycle': 1800,
+    'query_cache_size': 1200,
     'connect_args': {'timeout': 20}
 }
+if orjson:
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'].update(
+        json_serializer=lambda value: orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS).decode(),
+        json_deserializer=orjson.loads
+    )
 
 # File Upload Configuration - Enterprise limits
 app.config['UPLOAD_FOLDER'] = 'enterprise_files'
@@ -108,6 +138,15 @@ app.config['AUDIT_LOG_RETENTION_DAYS'] = int(os.environ.get('AUDIT_LOG_RETENTION
 # Initialize extensions
 db = SQLAlchemy(app)
 migrate = Migrate(app, db)
+
+# One engine (and pool) per process; report pool usage on checkout when debugging
+with app.app_context():
+    db_pool = db.engine.pool
+
+@event.listens_for(db_pool, 'checkout')
+def _log_pool_checkout(dbapi_connection, connection_record, connection_proxy):
+    if app.logger.isEnabledFor(logging.DEBUG):
+        app.logger.debug(f"Database pool checkout: {db_pool.status()}")
 csrf = CSRFProtect(app)
 cache = Cache(app)
 cors = CORS(app, supports_credentials=True)
@@ -118,7 +157,8 @@ limiter = Limiter(
     app,
     key_func=get_remote_address,
     default_limits=["1000 per day", "200 per hour", "50 per minute"],
-    storage_uri=app.config['REDIS_URL']
+    storage_uri=app.config['REDIS_URL'],
+    strategy='moving-window'
 )
 
 # Celery Configuration for background tasks
@@ -128,24 +168,166 @@ celery = Celery(
     broker=os.environ.get('CELERY_BROKER_URL', 'redis://localhost:6379/0')
 )
 
-# Encryption setup
-encryption_key = os.environ.get('ENCRYPTION_KEY', Fernet.generate_key())
-if isinstance(encryption_key, str):
-    encryption_key = encryption_key.encode()
-cipher_suite = Fernet(encryption_key)
+# Encryption setup - AES-256-GCM, key given as 32 url-safe base64 encoded bytes
+ENCRYPTION_CHUNK_SIZE = 4 * 1024 * 1024  # 4 MiB
+encryption_key = os.environ.get('ENCRYPTION_KEY')
+if encryption_key:
+    encryption_key = base64.urlsafe_b64decode(encryption_key)
+else:
+    encryption_key = AESGCM.generate_key(bit_length=256)
+aes_gcm = AESGCM(encryption_key)
 
 # Elasticsearch client
+class OrjsonSerializer(JsonSerializer):
+    """JSON serializer for the Elasticsearch transport backed by orjson"""
+    
+    def dumps(self, data):
+        if isinstance(data, (str, bytes)):
+            return super().dumps(data)
+        return orjson.dumps(data, default=self.default, option=orjson.OPT_NON_STR_KEYS)
+    
+    def loads(self, data):
+        return orjson.loads(data)
+
+es_options = {
+    'http_compress': True,
+    'connections_per_node': 25,
+    'retry_on_timeout': True,
+    'max_retries': 3,
+    'request_timeout': 30
+}
+if orjson:
+    es_options['serializers'] = {'application/json': OrjsonSerializer()}
+
 try:
-    es = Elasticsearch([app.config['ELASTICSEARCH_URL']])
+    es = Elasticsearch([app.config['ELASTICSEARCH_URL']], **es_options)
 except:
     es = None
 
 # Redis client
 try:
-    redis_client = redis.from_url(app.config['REDIS_URL'])
+    redis_pool = redis.ConnectionPool.from_url(
+        app.config['REDIS_URL'],
+        max_connections=64,
+        socket_keepalive=True,
+        health_check_interval=30
+    )
+    redis_client = redis.Redis(connection_pool=redis_pool)
 except:
     redis_client = None
 
+# Elasticsearch writes are queued and shipped by a background bulk indexer
+ES_QUEUE_MAXSIZE = 10_000
+ES_BULK_CHUNK_SIZE = 500
+ES_REFRESH_INTERVAL = '30s'
+ES_BULK_REFRESH_THRESHOLD = 5000  # batches above this size are loaded with refresh disabled
+ES_EXIT_TIMEOUT = 5.0  # seconds
+es_bulk_queue = queue.Queue(maxsize=ES_QUEUE_MAXSIZE)
+_es_worker_thread = None
+_es_worker_lock = threading.Lock()
+
+def _next_es_batch():
+    """Block for one queued action, then take whatever else is already waiting"""
+    batch = [es_bulk_queue.get()]
+    while len(batch) < ES_QUEUE_MAXSIZE:
+        try:
+            batch.append(es_bulk_queue.get_nowait())
+        except queue.Empty:
+            break
+    return batch
+
+def _ensure_es_index_template():
+    """Apply write-optimised settings to the audit and content indexes"""
+    try:
+        es.indices.put_index_template(
+            name='audit_tpl',
+            index_patterns=['audit-logs*', 'file-content*'],
+            template={'settings': {
+                'refresh_interval': ES_REFRESH_INTERVAL,
+                'number_of_shards': 1,
+                'translog.durability': 'async'
+            }}
+        )
+    except Exception as e:
+        app.logger.warning(f"Failed to install Elasticsearch index template: {e}")
+
+def _set_refresh_interval(indices, interval):
+    try:
+        es.indices.put_settings(index=','.join(indices), settings={'index': {'refresh_interval': interval}})
+    except Exception as e:
+        app.logger.warning(f"Failed to set refresh_interval={interval} on {indices}: {e}")
+
+def _index_es_batch(batch):
+    indices = sorted({action['_index'] for action in batch})
+    large_batch = len(batch) > ES_BULK_REFRESH_THRESHOLD
+    if large_batch:
+        _set_refresh_interval(indices, '-1')
+    try:
+        for ok, info in helpers.parallel_bulk(es, batch, thread_count=4, queue_size=8,
+                                              chunk_size=ES_BULK_CHUNK_SIZE,
+                                              raise_on_error=False):
+            if not ok:
+                app.logger.error(f"Failed to index document: {info}")
+    except Exception as e:
+        app.logger.error(f"Bulk indexing of {len(batch)} documents failed: {e}")
+    finally:
+        if large_batch:
+            _set_refresh_interval(indices, ES_REFRESH_INTERVAL)
+
+def _es_worker():
+    """Index queued documents with parallel_bulk"""
+    _ensure_es_index_template()
+    while True:
+        batch = _next_es_batch()
+        try:
+            _index_es_batch(batch)
+        finally:
+            for _ in batch:
+                es_bulk_queue.task_done()
+
+def _ensure_es_worker():
+    global _es_worker_thread
+    # Threads do not survive a fork, so each worker process starts its own
+    with _es_worker_lock:
+        if _es_worker_thread is None or not _es_worker_thread.is_alive():
+            _es_worker_thread = threading.Thread(target=_es_worker, name='es-bulk-indexer', daemon=True)
+            _es_worker_thread.start()
+
+def _wait_for_queue(work_queue, timeout=None):
+    """Block until every item put on work_queue is marked done, or timeout expires"""
+    deadline = None if timeout is None else time.monotonic() + timeout
+    with work_queue.all_tasks_done:
+        while work_queue.unfinished_tasks:
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                return False
+            work_queue.all_tasks_done.wait(remaining)
+    return True
+
+def enqueue_es_action(action):
+    """Queue a bulk action for the background indexer without waiting on Elasticsearch"""
+    if not es:
+        return
+    
+    _ensure_es_worker()
+    try:
+        es_bulk_queue.put_nowait(action)
+    except queue.Full:
+        app.logger.warning(f"Elasticsearch queue full, dropping document for {action['_index']}")
+
+def wait_for_es_indexing(timeout=None):
+    """Block until every queued Elasticsearch action has been sent, or timeout expires"""
+    if not es:
+        return True
+    _ensure_es_worker()
+    return _wait_for_queue(es_bulk_queue, timeout)
+
+@atexit.register
+def _flush_pending_es_actions():
+    """Give the bulk indexer a chance to finish before the process exits"""
+    if es_bulk_queue.unfinished_tasks and not wait_for_es_indexing(ES_EXIT_TIMEOUT):
+        app.logger.error(f"Exiting with {es_bulk_queue.unfinished_tasks} Elasticsearch documents unsent")
+
 # Create necessary directories
 directories = [
     app.config['UPLOAD_FOLDER'], 'thumbnails', 'file_versions', 
@@ -176,13 +358,39 @@ if not app.debug:
     app.logger.setLevel(logging.INFO)
     app.logger.info('Enterprise File Management System startup')
 
+# New checksums are BLAKE3 (BLAKE3_PREFIX + hex) when the blake3 package is
+# installed; it hashes large inputs on several threads by itself.
+# Without it, files of TREE_HASH_THRESHOLD bytes or more get a tree hash: SHA-256
+# of the concatenated SHA-256 digests of each TREE_HASH_CHUNK slice, computed in
+# parallel, and smaller files a plain SHA-256 hex digest.
+# The stored checksum carries its prefix so verification knows the scheme.
+BLAKE3_PREFIX = 'b3:'
+TREE_HASH_THRESHOLD = 256 << 20  # 256 MiB
+TREE_HASH_CHUNK = 16 << 20  # 16 MiB
+TREE_HASH_PREFIX = 'sha256-tree-16m:'
+
+def _sha256_digest(data):
+    return hashlib.sha256(data).digest()
+
+# Role hierarchy, lowest to highest
+_ROLE_RANK = {
+    'user': 0,
+    'manager': 1,
+    'admin': 2,
+    'super_admin': 3
+}
+_ADMIN_ROLES = frozenset({'admin', 'super_admin'})
+
+# JSON documents are stored as JSONB on PostgreSQL (parsed once, indexable)
+JSONDocument = db.JSON().with_variant(postgresql.JSONB(), 'postgresql')
+
 # Database Models - Enterprise Schema
 
 class Organization(db.Model):
     """Multi-tenant organization model"""
     __tablename__ = 'organizations'
     
-    id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    id = db.Column(db.Uuid, primary_key=True, default=uuid.uuid4)
     name = db.Column(db.String(255), nullable=False)
     domain = db.Column(db.String(255), unique=True, nullable=False)
     subscription_tier = db.Column(db.String(20), default='enterprise')
@@ -199,8 +407,8 @@ class User(db.Model):
     """Enhanced user model with enterprise features"""
     __tablename__ = 'users'
     
-    id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
-    organization_id = db.Column(db.String(36), db.ForeignKey('organizations.id'), nullable=False)
+    id = db.Column(db.Uuid, primary_key=True, default=uuid.uuid4)
+    organization_id = db.Column(db.Uuid, db.ForeignKey('organizations.id'), nullable=False)
     username = db.Column(db.String(80), nullable=False, index=True)
     email = db.Column(db.String(255), nullable=False, index=True)
     password_hash = db.Column(db.String(255), nullable=False)
@@ -233,7 +441,7 @@ class User(db.Model):
     
     @property
     def is_admin(self):
-        return self.role in ['admin', 'super_admin']
+        return self.role in _ADMIN_ROLES
     
     def check_password(self, password):
         return check_password_hash(self.password_hash, password)
@@ -242,6 +450,7 @@ class User(db.Model):
         if not self.two_factor_secret:
             self.two_factor_secret = pyotp.random_base32()
             db.session.commit()
+            invalidate_cached_user(self.id)
         return self.two_factor_secret
     
     def verify_totp(self, token):
@@ -254,30 +463,30 @@ class FileMetadata(db.Model):
     """Enhanced file metadata with enterprise features"""
     __tablename__ = 'file_metadata'
     
-    id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
-    organization_id = db.Column(db.String(36), db.ForeignKey('organizations.id'), nullable=False)
+    id = db.Column(db.Uuid, primary_key=True, default=uuid.uuid4)
+    organization_id = db.Column(db.Uuid, db.ForeignKey('organizations.id'), nullable=False)
     name = db.Column(db.String(500), nullable=False)
     original_name = db.Column(db.String(500), nullable=False)
     file_path = db.Column(db.String(1000), nullable=False)
     file_type = db.Column(db.String(100), nullable=False)
     mime_type = db.Column(db.String(200))
     size = db.Column(db.BigInteger, nullable=False)
-    checksum = db.Column(db.String(64), nullable=False)  # SHA-256
+    checksum = db.Column(db.String(100), nullable=False)  # BLAKE3_PREFIX + hex, SHA-256 hex, or TREE_HASH_PREFIX + hex
     
     # Hierarchy
-    parent_folder_id = db.Column(db.String(36), db.ForeignKey('file_metadata.id'))
+    parent_folder_id = db.Column(db.Uuid, db.ForeignKey('file_metadata.id'))
     is_folder = db.Column(db.Boolean, default=False)
     folder_path = db.Column(db.String(2000))
     
     # Classification
     classification = db.Column(db.String(50), default='internal')  # public, internal, confidential, restricted
     category = db.Column(db.String(100))
-    tags = db.Column(db.JSON, default=[])
+    tags = db.Column(JSONDocument, default=list)
     
     # Version control
     version_number = db.Column(db.Integer, default=1)
     is_latest_version = db.Column(db.Boolean, default=True)
-    parent_version_id = db.Column(db.String(36), db.ForeignKey('file_metadata.id'))
+    parent_version_id = db.Column(db.Uuid, db.ForeignKey('file_metadata.id'))
     
     # Security
     is_encrypted = db.Column(db.Boolean, default=False)
@@ -288,15 +497,15 @@ class FileMetadata(db.Model):
     # Compliance
     retention_until = db.Column(db.DateTime)
     legal_hold = db.Column(db.Boolean, default=False)
-    compliance_flags = db.Column(db.JSON, default={})
+    compliance_flags = db.Column(JSONDocument, default=dict)
     
     # Metadata
-    metadata = db.Column(db.JSON, default={})
-    custom_fields = db.Column(db.JSON, default={})
+    extra_metadata = db.Column('metadata', JSONDocument, default=dict)
+    custom_fields = db.Column(JSONDocument, default=dict)
     
     # Tracking
-    created_by_id = db.Column(db.String(36), db.ForeignKey('users.id'), nullable=False)
-    updated_by_id = db.Column(db.String(36), db.ForeignKey('users.id'))
+    created_by_id = db.Column(db.Uuid, db.ForeignKey('users.id'), nullable=False)
+    updated_by_id = db.Column(db.Uuid, db.ForeignKey('users.id'))
     created_at = db.Column(db.DateTime, default=datetime.datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.datetime.utcnow, onupdate=datetime.datetime.utcnow)
     accessed_at = db.Column(db.DateTime)
@@ -310,21 +519,74 @@ class FileMetadata(db.Model):
     shares = db.relationship('FileShare', backref='file', lazy='dynamic', cascade='all, delete-orphan')
     comments = db.relationship('FileComment', backref='file', lazy='dynamic', cascade='all, delete-orphan')
     
+    # Indexes
+    __table_args__ = (
+        db.Index('ix_file_org_folder_updated', 'organization_id', 'is_folder', 'updated_at'),
+        db.Index('ix_file_org_checksum', 'organization_id', 'checksum'),
+        db.Index('ix_file_tags_gin', 'tags', postgresql_using='gin').ddl_if(dialect='postgresql'),
+    )
+    
     def calculate_checksum(self, file_path):
-        """Calculate SHA-256 checksum"""
-        sha256_hash = hashlib.sha256()
-        with open(file_path, "rb") as f:
-            for byte_block in iter(lambda: f.read(4096), b""):
-                sha256_hash.update(byte_block)
-        return sha256_hash.hexdigest()
+        """Calculate a checksum with the scheme used for new files"""
+        if blake3:
+            return self.calculate_checksum_blake3(file_path)
+        if os.path.getsize(file_path) >= TREE_HASH_THRESHOLD:
+            return self.calculate_checksum_parallel(file_path)
+        return self.calculate_checksum_sha256(file_path)
+    
+    def verify_checksum(self, file_path=None):
+        """Recompute the stored checksum with the scheme it was written with"""
+        file_path = file_path or self.file_path
+        if self.checksum.startswith(BLAKE3_PREFIX):
+            if not blake3:
+                raise RuntimeError('The blake3 package is required to verify this checksum')
+            actual = self.calculate_checksum_blake3(file_path)
+        elif self.checksum.startswith(TREE_HASH_PREFIX):
+            actual = self.calculate_checksum_parallel(file_path)
+        else:
+            actual = self.calculate_checksum_sha256(file_path)
+        return actual == self.checksum
+    
+    def calculate_checksum_blake3(self, file_path):
+        """Calculate a BLAKE3 checksum from a memory map, on as many threads as it pays to use"""
+        hasher = blake3.blake3(max_threads=blake3.blake3.AUTO)
+        hasher.update_mmap(file_path)
+        return BLAKE3_PREFIX + hasher.hexdigest()
+    
+    def calculate_checksum_sha256(self, file_path):
+        """Calculate a plain SHA-256 checksum"""
+        with open(file_path, "rb", buffering=0) as f:
+            if hasattr(hashlib, 'file_digest'):
+                return hashlib.file_digest(f, "sha256").hexdigest()
+            
+            # Python < 3.11: read into one reused 4 MiB buffer
+            sha256_hash = hashlib.sha256()
+            buffer = bytearray(4 << 20)
+            view = memoryview(buffer)
+            while size := f.readinto(buffer):
+                sha256_hash.update(view[:size])
+            return sha256_hash.hexdigest()
+    
+    def calculate_checksum_parallel(self, file_path, chunk_size=TREE_HASH_CHUNK):
+        """Calculate a SHA-256 tree hash, digesting chunks of the file on all cores"""
+        with open(file_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            view = memoryview(mm)
+            try:
+                offsets = range(0, len(mm), chunk_size)
+                with ThreadPoolExecutor(max_workers=os.cpu_count() or 1) as pool:
+                    digests = list(pool.map(lambda offset: _sha256_digest(view[offset:offset + chunk_size]),
+                                            offsets))
+            finally:
+                view.release()
+        return TREE_HASH_PREFIX + hashlib.sha256(b''.join(digests)).hexdigest()
 
 class FilePermission(db.Model):
     """Granular file permissions"""
     __tablename__ = 'file_permissions'
     
-    id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
-    file_id = db.Column(db.String(36), db.ForeignKey('file_metadata.id'), nullable=False)
-    user_id = db.Column(db.String(36), db.ForeignKey('users.id'))
+    id = db.Column(db.Uuid, primary_key=True, default=uuid.uuid4)
+    file_id = db.Column(db.Uuid, db.ForeignKey('file_metadata.id'), nullable=False)
+    user_id = db.Column(db.Uuid, db.ForeignKey('users.id'))
     department = db.Column(db.String(100))
     role = db.Column(db.String(50))
     
@@ -336,19 +598,24 @@ class FilePermission(db.Model):
     can_admin = db.Column(db.Boolean, default=False)
     
     # Constraints
-    granted_by_id = db.Column(db.String(36), db.ForeignKey('users.id'), nullable=False)
+    granted_by_id = db.Column(db.Uuid, db.ForeignKey('users.id'), nullable=False)
     granted_at = db.Column(db.DateTime, default=datetime.datetime.utcnow)
     expires_at = db.Column(db.DateTime)
     conditions = db.Column(db.JSON, default={})  # IP restrictions, time constraints, etc.
+    
+    # Indexes
+    __table_args__ = (
+        db.Index('ix_perm_user_file', 'user_id', 'file_id'),
+    )
 
 class FileShare(db.Model):
     """Secure file sharing"""
     __tablename__ = 'file_shares'
     
-    id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
-    file_id = db.Column(db.String(36), db.ForeignKey('file_metadata.id'), nullable=False)
+    id = db.Column(db.Uuid, primary_key=True, default=uuid.uuid4)
+    file_id = db.Column(db.Uuid, db.ForeignKey('file_metadata.id'), nullable=False)
     share_token = db.Column(db.String(128), unique=True, nullable=False)
-    created_by_id = db.Column(db.String(36), db.ForeignKey('users.id'), nullable=False)
+    created_by_id = db.Column(db.Uuid, db.ForeignKey('users.id'), nullable=False)
     
     # Access control
     password_hash = db.Column(db.String(255))
@@ -371,10 +638,10 @@ class FileComment(db.Model):
     """File comments and annotations"""
     __tablename__ = 'file_comments'
     
-    id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
-    file_id = db.Column(db.String(36), db.ForeignKey('file_metadata.id'), nullable=False)
-    user_id = db.Column(db.String(36), db.ForeignKey('users.id'), nullable=False)
-    parent_comment_id = db.Column(db.String(36), db.ForeignKey('file_comments.id'))
+    id = db.Column(db.Uuid, primary_key=True, default=uuid.uuid4)
+    file_id = db.Column(db.Uuid, db.ForeignKey('file_metadata.id'), nullable=False)
+    user_id = db.Column(db.Uuid, db.ForeignKey('users.id'), nullable=False)
+    parent_comment_id = db.Column(db.Uuid, db.ForeignKey('file_comments.id'))
     
     content = db.Column(db.Text, nullable=False)
     comment_type = db.Column(db.String(50), default='general')  # general, approval, suggestion, issue
@@ -382,7 +649,7 @@ class FileComment(db.Model):
     
     # Status
     is_resolved = db.Column(db.Boolean, default=False)
-    resolved_by_id = db.Column(db.String(36), db.ForeignKey('users.id'))
+    resolved_by_id = db.Column(db.Uuid, db.ForeignKey('users.id'))
     resolved_at = db.Column(db.DateTime)
     
     created_at = db.Column(db.DateTime, default=datetime.datetime.utcnow)
@@ -394,12 +661,12 @@ class FileComment(db.Model):
     replies = db.relationship('FileComment', backref=db.backref('parent_comment', remote_side=[id]), lazy='dynamic')
 
 class AuditLog(db.Model):
-    """Comprehensive audit logging"""
+    """Comprehensive audit logging, range-partitioned by month on PostgreSQL"""
     __tablename__ = 'audit_logs'
     
-    id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
-    organization_id = db.Column(db.String(36), db.ForeignKey('organizations.id'), nullable=False)
-    user_id = db.Column(db.String(36), db.ForeignKey('users.id'))
+    id = db.Column(db.Uuid, primary_key=True, default=uuid.uuid4)
+    organization_id = db.Column(db.Uuid, db.ForeignKey('organizations.id'), nullable=False)
+    user_id = db.Column(db.Uuid, db.ForeignKey('users.id'))
     
     # Event details
     event_type = db.Column(db.String(100), nullable=False)
@@ -417,16 +684,31 @@ class AuditLog(db.Model):
     severity = db.Column(db.String(20), default='info')  # info, warning, error, critical
     compliance_relevant = db.Column(db.Boolean, default=False)
     
-    # Metadata
-    timestamp = db.Column(db.DateTime, default=datetime.datetime.utcnow)
-    indexed = db.Column(db.Boolean, default=False)
+    # Metadata - part of the primary key because it is the partition key
+    timestamp = db.Column(db.DateTime, primary_key=True, default=datetime.datetime.utcnow)
+    
+    # Indexes
+    __table_args__ = (
+        db.Index('ix_audit_org_time_event', 'organization_id', 'timestamp', 'event_type'),
+        db.Index('ix_audit_compliance', 'organization_id', 'timestamp',
+                 postgresql_where=db.text('compliance_relevant'),
+                 sqlite_where=db.text('compliance_relevant')),
+        {'postgresql_partition_by': 'RANGE (timestamp)'}
+    )
+
+# Rows outside every monthly partition land here instead of failing the insert;
+# maintain_audit_partitions moves them out when their month is created
+AUDIT_DEFAULT_PARTITION = 'audit_logs_default'
+event.listen(AuditLog.__table__, 'after_create', DDL(
+    f"CREATE TABLE IF NOT EXISTS {AUDIT_DEFAULT_PARTITION} PARTITION OF audit_logs DEFAULT"
+).execute_if(dialect='postgresql'))
 
 class WorkflowTemplate(db.Model):
     """Workflow templates for document processes"""
     __tablename__ = 'workflow_templates'
     
-    id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
-    organization_id = db.Column(db.String(36), db.ForeignKey('organizations.id'), nullable=False)
+    id = db.Column(db.Uuid, primary_key=True, default=uuid.uuid4)
+    organization_id = db.Column(db.Uuid, db.ForeignKey('organizations.id'), nullable=False)
     name = db.Column(db.String(255), nullable=False)
     description = db.Column(db.Text)
     category = db.Column(db.String(100), nullable=False)
@@ -438,7 +720,7 @@ class WorkflowTemplate(db.Model):
     
     # Status
     is_active = db.Column(db.Boolean, default=True)
-    created_by_id = db.Column(db.String(36), db.ForeignKey('users.id'), nullable=False)
+    created_by_id = db.Column(db.Uuid, db.ForeignKey('users.id'), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.datetime.utcnow, onupdate=datetime.datetime.utcnow)
 
@@ -446,17 +728,17 @@ class WorkflowInstance(db.Model):
     """Active workflow instances"""
     __tablename__ = 'workflow_instances'
     
-    id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
-    template_id = db.Column(db.String(36), db.ForeignKey('workflow_templates.id'), nullable=False)
-    file_id = db.Column(db.String(36), db.ForeignKey('file_metadata.id'), nullable=False)
+    id = db.Column(db.Uuid, primary_key=True, default=uuid.uuid4)
+    template_id = db.Column(db.Uuid, db.ForeignKey('workflow_templates.id'), nullable=False)
+    file_id = db.Column(db.Uuid, db.ForeignKey('file_metadata.id'), nullable=False)
     
     # Status
     status = db.Column(db.String(50), default='pending')  # pending, in_progress, completed, cancelled
     current_step = db.Column(db.Integer, default=0)
     
     # Participants
-    initiated_by_id = db.Column(db.String(36), db.ForeignKey('users.id'), nullable=False)
-    current_assignee_id = db.Column(db.String(36), db.ForeignKey('users.id'))
+    initiated_by_id = db.Column(db.Uuid, db.ForeignKey('users.id'), nullable=False)
+    current_assignee_id = db.Column(db.Uuid, db.ForeignKey('users.id'))
     
     # Tracking
     step_history = db.Column(db.JSON, default=[])
@@ -486,65 +768,557 @@ class UploadForm(FlaskForm):
     description = TextAreaField('Description')
 
 # Utility Functions
+_ALLOWED_EXTS = frozenset(ext.lower() for ext in app.config['ALLOWED_EXTENSIONS'])
+_ALLOWED_EXT_RE = re.compile(
+    r'\.(?:' + '|'.join(re.escape(ext) for ext in sorted(_ALLOWED_EXTS)) + r')\Z',
+    re.IGNORECASE
+)
+
 def allowed_file(filename):
-    return '.' in filename and \
-           filename.rsplit('.', 1)[1].lower() in app.config['ALLOWED_EXTENSIONS']
+    return _ALLOWED_EXT_RE.search(filename) is not None
+
+# Names secure_filename returns unchanged: ASCII letters, digits, '.', '_' and
+# '-', no whitespace, not starting or ending with '.' or '_'
+_SAFE_FILENAME_RE = re.compile(r'[A-Za-z0-9-](?:[A-Za-z0-9._-]{0,253}[A-Za-z0-9-])?')
+
+def fast_secure_filename(filename):
+    """secure_filename, skipping its normalisation for names that are already safe"""
+    # Windows additionally renames reserved device names, so always defer there
+    if os.name != 'nt' and _SAFE_FILENAME_RE.fullmatch(filename):
+        return filename
+    return secure_filename(filename)
+
+# Keyed by lowercase extension; upload_file stores file_type lowercased
+_FILE_ICONS: Dict[str, str] = {
+    'pdf': '📄', 'doc': '📝', 'docx': '📝', 'txt': '📄',
+    'xls': '📊', 'xlsx': '📊', 'csv': '📊',
+    'ppt': '📊', 'pptx': '📊',
+    'png': '🖼️', 'jpg': '🖼️', 'jpeg': '🖼️', 'gif': '🖼️',
+    'mp4': '🎥', 'avi': '🎥', 'mov': '🎥',
+    'mp3': '🎵', 'wav': '🎵',
+    'zip': '📦', 'rar': '📦', '7z': '📦',
+    'py': '🐍', 'js': '📜', 'html': '🌐', 'css': '🎨'
+}
+_DEFAULT_FILE_ICON = '📄'
 
 def get_file_icon(file_type):
     """Get appropriate icon for file type"""
-    icons = {
-        'pdf': '📄', 'doc': '📝', 'docx': '📝', 'txt': '📄',
-        'xls': '📊', 'xlsx': '📊', 'csv': '📊',
-        'ppt': '📊', 'pptx': '📊',
-        'png': '🖼️', 'jpg': '🖼️', 'jpeg': '🖼️', 'gif': '🖼️',
-        'mp4': '🎥', 'avi': '🎥', 'mov': '🎥',
-        'mp3': '🎵', 'wav': '🎵',
-        'zip': '📦', 'rar': '📦', '7z': '📦',
-        'py': '🐍', 'js': '📜', 'html': '🌐', 'css': '🎨'
+    return _FILE_ICONS.get(file_type, _DEFAULT_FILE_ICON)
+
+UPLOAD_CHUNK_SIZE = 1 << 20  # 1 MiB
+QUEUED_WRITE_THRESHOLD = 4 << 20  # uploads above this are written from a background thread
+QUEUED_WRITE_BYTES = 32 << 20  # data a queued writer may hold before the reader waits
+
+def _write_all(fd, data):
+    """Write every byte of data to a raw file descriptor"""
+    view = memoryview(data)
+    while view:
+        view = view[os.write(fd, view):]
+
+class _ChunkWriter:
+    """Write chunks to a file descriptor, optionally from a background thread
+    
+    With a queue_depth the caller only blocks once that many chunks are pending,
+    so reading and hashing the next chunk overlaps the write(2) of the last one.
+    """
+    
+    def __init__(self, fd, queue_depth=0):
+        self._fd = fd
+        self._error = None
+        self._queue = None
+        self._thread = None
+        if queue_depth:
+            self._queue = queue.Queue(maxsize=queue_depth)
+            self._thread = threading.Thread(target=self._drain, name='upload-writer', daemon=True)
+            self._thread.start()
+    
+    def _drain(self):
+        while (chunk := self._queue.get()) is not None:
+            if self._error is None:
+                try:
+                    _write_all(self._fd, chunk)
+                except OSError as e:
+                    self._error = e
+    
+    def write(self, chunk):
+        if self._error:
+            raise self._error
+        if self._queue is None:
+            _write_all(self._fd, chunk)
+        else:
+            self._queue.put(chunk)
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        if self._thread:
+            self._queue.put(None)
+            self._thread.join()
+        if self._error and exc_type is None:
+            raise self._error
+
+def _stream_size(stream):
+    """Size of a seekable stream, or None when it cannot be determined"""
+    try:
+        position = stream.tell()
+        size = stream.seek(0, io.SEEK_END)
+        stream.seek(position)
+        return size - position
+    except (AttributeError, OSError, ValueError):
+        return None
+
+def _read_full(stream, size):
+    """Read exactly size bytes unless the stream ends first"""
+    chunk = stream.read(size)
+    while chunk and len(chunk) < size:
+        more = stream.read(size - len(chunk))
+        if not more:
+            break
+        chunk += more
+    return chunk
+
+def _write_and_tree_hash(stream, writer):
+    """Write a stream, digesting each TREE_HASH_CHUNK on a thread pool as it arrives"""
+    workers = os.cpu_count() or 1
+    size = 0
+    digests = []
+    pending = collections.deque()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        while chunk := _read_full(stream, TREE_HASH_CHUNK):
+            writer.write(chunk)
+            size += len(chunk)
+            pending.append(pool.submit(_sha256_digest, chunk))
+            # Bound the chunks held in memory while hashing falls behind
+            if len(pending) > 2 * workers:
+                digests.append(pending.popleft().result())
+        digests.extend(future.result() for future in pending)
+    return TREE_HASH_PREFIX + hashlib.sha256(b''.join(digests)).hexdigest(), size
+
+# Cleared when linking through /proc turns out to be unsupported, so later uploads write in place
+_use_tmpfile_uploads = hasattr(os, 'O_TMPFILE')
+# Errors that mean the platform can't link an O_TMPFILE, rather than a passing failure like ENOSPC
+_TMPFILE_LINK_UNSUPPORTED = frozenset({errno.EXDEV, errno.EPERM, errno.EOPNOTSUPP, errno.ENOENT})
+
+def _open_upload_target(dest_path):
+    """Open an unnamed file in dest_path's directory, or dest_path itself without O_TMPFILE"""
+    if _use_tmpfile_uploads:
+        try:
+            return os.open(os.path.dirname(dest_path) or '.', os.O_TMPFILE | os.O_RDWR, 0o666), True
+        except OSError:
+            pass  # filesystem without O_TMPFILE support
+    return os.open(dest_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o666), False
+
+def _publish_tmpfile(fd, dest_path):
+    """Give an O_TMPFILE its final name, copying it out where linking is refused"""
+    global _use_tmpfile_uploads
+    try:
+        os.link(f'/proc/self/fd/{fd}', dest_path)
+        return
+    except OSError as e:
+        if e.errno not in _TMPFILE_LINK_UNSUPPORTED:
+            raise
+        app.logger.warning(f"Linking O_TMPFILE uploads is not supported here, writing in place: {e}")
+        _use_tmpfile_uploads = False
+
+    out = os.open(dest_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666)
+    try:
+        offset, size = 0, os.fstat(fd).st_size
+        while offset < size:
+            offset += os.sendfile(out, fd, offset, size - offset)
+    except BaseException:
+        os.remove(dest_path)
+        raise
+    finally:
+        os.close(out)
+
+def _link_duplicate(existing_path, dest_path):
+    """Point dest_path at an identical stored file, returning False if it cannot be linked"""
+    staged = f'{dest_path}.dup'
+    try:
+        os.link(existing_path, staged)
+    except OSError as e:
+        app.logger.debug(f"Cannot link duplicate upload to {existing_path}: {e}")
+        return False
+    try:
+        os.replace(staged, dest_path)
+    except OSError as e:
+        os.remove(staged)
+        app.logger.warning(f"Cannot replace {dest_path} with a link to {existing_path}: {e}")
+        return False
+    return True
+
+def save_and_hash(stream, dest_path):
+    """Write a stream to disk, returning its checksum and size from the same pass"""
+    size = _stream_size(stream)
+    large = size is not None and size >= TREE_HASH_THRESHOLD
+    tree_hash = large and not blake3
+    chunk_size = TREE_HASH_CHUNK if large else UPLOAD_CHUNK_SIZE
+    queue_depth = QUEUED_WRITE_BYTES // chunk_size if size and size > QUEUED_WRITE_THRESHOLD else 0
+    
+    # Data goes to an unnamed file that only gets its name once complete and
+    # flushed, so a crash never leaves a partial upload at dest_path
+    fd, anonymous = _open_upload_target(dest_path)
+    try:
+        with _ChunkWriter(fd, queue_depth) as writer:
+            if tree_hash:
+                result = _write_and_tree_hash(stream, writer)
+            else:
+                if blake3:
+                    # Big chunks of a large upload are hashed on several threads
+                    content_hash = blake3.blake3(max_threads=blake3.blake3.AUTO if large else 1)
+                    prefix = BLAKE3_PREFIX
+                else:
+                    content_hash = hashlib.sha256()
+                    prefix = ''
+                written = 0
+                while chunk := stream.read(chunk_size):
+                    writer.write(chunk)
+                    content_hash.update(chunk)
+                    written += len(chunk)
+                result = prefix + content_hash.hexdigest(), written
+            
+        if anonymous:
+            os.fsync(fd)
+            _publish_tmpfile(fd, dest_path)
+        return result
+    except BaseException:
+        if not anonymous:
+            try:
+                os.remove(dest_path)
+            except OSError:
+                pass
+        raise
+    finally:
+        os.close(fd)
+
+UPLOAD_WORKERS = min(8, os.cpu_count() or 1)
+UPLOAD_PERMISSION_COLUMNS = (
+    'id', 'file_id', 'user_id', 'can_read', 'can_write', 'can_delete', 'can_share', 'can_admin',
+    'granted_by_id', 'granted_at', 'conditions'
+)
+
+def _batch_uuid4(count):
+    """Random UUIDs for a whole batch from a single os.urandom call"""
+    blob = os.urandom(16 * count)
+    # version=4 sets the version and RFC 4122 variant bits like uuid.uuid4()
+    return [uuid.UUID(bytes=blob[i:i + 16], version=4) for i in range(0, len(blob), 16)]
+
+def _process_single_upload(file, upload_path, file_id):
+    """Store and hash one uploaded file, returning its FileMetadata fields"""
+    # Generate secure filename
+    original_name = file.filename
+    secure_name = fast_secure_filename(original_name)
+    file_extension = secure_name.rsplit('.', 1)[1].lower() if '.' in secure_name else ''
+    stored_filename = f"{file_id}.{file_extension}"
+    mime_type = mimetypes.guess_type(original_name)[0] or 'application/octet-stream'
+    file_path = os.path.join(upload_path, stored_filename)
+    
+    # Save file
+    checksum, size = save_and_hash(file.stream, file_path)
+    
+    return {
+        'id': file_id,
+        'name': secure_name,
+        'original_name': original_name,
+        'file_path': file_path,
+        'file_type': file_extension,
+        'mime_type': mime_type,
+        'size': size,
+        'checksum': checksum
     }
-    return icons.get(file_type.lower(), '📄')
 
-def log_audit_event(user_id, event_type, action, resource_type=None, resource_id=None, details=None):
-    """Log audit events for compliance"""
+def _link_duplicate_uploads(stored, organization_id):
+    """Replace stored uploads whose content the organization already has with hard links
+    
+    One query covers the whole batch; files repeated within the batch are
+    linked to the first copy.
+    """
     try:
-        audit_log = AuditLog(
-            organization_id=session.get('organization_id'),
-            user_id=user_id,
-            event_type=event_type,
-            action=action,
-            resource_type=resource_type,
-            resource_id=resource_id,
-            details=details or {},
-            ip_address=request.remote_addr,
-            user_agent=request.headers.get('User-Agent'),
-            session_id=session.get('session_id'),
-            compliance_relevant=True
-        )
-        db.session.add(audit_log)
+        existing = dict(db.session.execute(
+            db.select(FileMetadata.checksum, FileMetadata.file_path)
+            .filter_by(organization_id=organization_id, is_encrypted=False)
+            .where(FileMetadata.checksum.in_({item['checksum'] for item in stored}))
+        ).all())
+    except Exception as e:
+        db.session.rollback()
+        app.logger.warning(f"Duplicate lookup failed, keeping new copies: {e}")
+        return
+    
+    for item in stored:
+        duplicate = existing.get(item['checksum'])
+        if not duplicate or not _link_duplicate(duplicate, item['file_path']):
+            existing.setdefault(item['checksum'], item['file_path'])
+
+def _discard_stored_uploads(stored):
+    """Remove files written for an upload batch that could not be recorded"""
+    for item in stored:
+        try:
+            os.remove(item['file_path'])
+        except OSError as e:
+            app.logger.warning(f"Failed to remove orphaned upload {item['file_path']}: {e}")
+
+# Encrypted files are a sequence of chunks: 12-byte nonce, 4-byte ciphertext
+# length, ciphertext + tag. The chunk index and a final-chunk flag are bound as
+# associated data so chunks cannot be reordered or the file truncated.
+_CHUNK_HEADER = struct.Struct('>12sI')
+
+def _chunk_aad(index, is_last):
+    return struct.pack('>Q?', index, is_last)
+
+def encrypt_file(src_path, dest_path):
+    """Encrypt a file with AES-GCM in ENCRYPTION_CHUNK_SIZE chunks"""
+    with open(src_path, 'rb') as src, open(dest_path, 'wb') as dest:
+        index = 0
+        chunk = src.read(ENCRYPTION_CHUNK_SIZE)
+        while True:
+            next_chunk = src.read(ENCRYPTION_CHUNK_SIZE)
+            nonce = os.urandom(12)
+            ciphertext = aes_gcm.encrypt(nonce, chunk, _chunk_aad(index, not next_chunk))
+            dest.write(_CHUNK_HEADER.pack(nonce, len(ciphertext)))
+            dest.write(ciphertext)
+            if not next_chunk:
+                break
+            chunk = next_chunk
+            index += 1
+
+def decrypt_file(src_path, dest_path):
+    """Decrypt a file written by encrypt_file"""
+    with open(src_path, 'rb') as src, open(dest_path, 'wb') as dest:
+        index = 0
+        header = src.read(_CHUNK_HEADER.size)
+        while header:
+            if len(header) != _CHUNK_HEADER.size:
+                raise ValueError('Encrypted file is truncated')
+            nonce, length = _CHUNK_HEADER.unpack(header)
+            ciphertext = src.read(length)
+            if len(ciphertext) != length:
+                raise ValueError('Encrypted file is truncated')
+            header = src.read(_CHUNK_HEADER.size)
+            dest.write(aes_gcm.decrypt(nonce, ciphertext, _chunk_aad(index, not header)))
+            index += 1
+        if index == 0:
+            raise ValueError('Encrypted file is empty')
+
+# COPY text format: tab separated, \N for NULL, backslash escapes
+_COPY_ESCAPES = str.maketrans({'\\': '\\\\', '\t': '\\t', '\n': '\\n', '\r': '\\r'})
+
+def _copy_value(value):
+    if value is None:
+        return '\\N'
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    if isinstance(value, (dict, list)):
+        value = app.config['SQLALCHEMY_ENGINE_OPTIONS'].get('json_serializer', json.dumps)(value)
+    return str(value).translate(_COPY_ESCAPES)
+
+def bulk_copy(table, rows, cols):
+    """Insert rows in the session's transaction, with COPY on PostgreSQL
+    
+    Columns missing from a row get their Python-side default, as with INSERT.
+    Other dialects fall back to a Core executemany insert.
+    """
+    if not rows:
+        return
+    if db.engine.dialect.name != 'postgresql':
+        db.session.execute(table.insert(), rows)
+        return
+    
+    defaults = {name: table.c[name].default for name in cols if table.c[name].default is not None}
+    buf = io.StringIO()
+    for row in rows:
+        values = []
+        for name in cols:
+            if name in row:
+                value = row[name]
+            elif name in defaults:
+                default = defaults[name]
+                value = default.arg(None) if default.is_callable else default.arg
+            else:
+                value = None
+            values.append(_copy_value(value))
+        buf.write('\t'.join(values))
+        buf.write('\n')
+    buf.seek(0)
+    
+    # The session's own DBAPI connection keeps COPY inside the current transaction
+    cursor = db.session.connection().connection.cursor()
+    try:
+        cursor.copy_expert(f"COPY {table.name} ({', '.join(cols)}) FROM STDIN", buf)
+    finally:
+        cursor.close()
+
+# Audit events are queued per process and written in batches by a background thread
+AUDIT_FLUSH_SIZE = 500
+AUDIT_FLUSH_INTERVAL = 0.2  # seconds
+AUDIT_EXIT_TIMEOUT = 5.0  # seconds
+AUDIT_Q = queue.Queue()
+_audit_writer_thread = None
+_audit_writer_lock = threading.Lock()
+AUDIT_COPY_COLUMNS = (
+    'id', 'organization_id', 'user_id', 'event_type', 'action', 'resource_type', 'resource_id',
+    'details', 'ip_address', 'user_agent', 'session_id', 'severity', 'compliance_relevant', 'timestamp'
+)
+
+def _next_audit_batch():
+    """Block for one queued event, then collect more for up to AUDIT_FLUSH_INTERVAL"""
+    batch = [AUDIT_Q.get()]
+    deadline = time.monotonic() + AUDIT_FLUSH_INTERVAL
+    while len(batch) < AUDIT_FLUSH_SIZE:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        try:
+            batch.append(AUDIT_Q.get(timeout=remaining))
+        except queue.Empty:
+            break
+    return batch
+
+def _write_audit_batch(batch):
+    """Insert audit events, splitting the batch on failure so a bad row only loses itself"""
+    try:
+        bulk_copy(AuditLog.__table__, batch, AUDIT_COPY_COLUMNS)
         db.session.commit()
-        
-        # Index in Elasticsearch for search
-        if es:
+    except Exception as e:
+        db.session.rollback()
+        if len(batch) == 1:
+            app.logger.error(f"Failed to write audit event {batch[0]['event_type']}/{batch[0]['action']}: {e}")
+            return
+        middle = len(batch) // 2
+        _write_audit_batch(batch[:middle])
+        _write_audit_batch(batch[middle:])
+
+def _audit_writer():
+    """Insert queued audit events in multi-row batches"""
+    # Don't rely on beat or the dev server entry point having created this month's partition
+    with app.app_context():
+        if db.engine.dialect.name == 'postgresql':
             try:
-                es.index(
-                    index='audit-logs',
-                    body={
-                        'timestamp': audit_log.timestamp.isoformat(),
-                        'user_id': user_id,
-                        'event_type': event_type,
-                        'action': action,
-                        'resource_type': resource_type,
-                        'resource_id': resource_id,
-                        'details': details,
-                        'ip_address': audit_log.ip_address
-                    }
-                )
+                ensure_audit_partitions()
+                db.session.commit()
             except Exception as e:
-                app.logger.warning(f"Failed to index audit log: {e}")
-                
+                db.session.rollback()
+                app.logger.warning(f"Failed to create audit log partitions: {e}")
+    while True:
+        batch = _next_audit_batch()
+        with app.app_context():
+            _write_audit_batch(batch)
+        for _ in batch:
+            AUDIT_Q.task_done()
+
+def _ensure_audit_writer():
+    global _audit_writer_thread
+    # Threads do not survive a fork, so each worker process starts its own
+    with _audit_writer_lock:
+        if _audit_writer_thread is None or not _audit_writer_thread.is_alive():
+            _audit_writer_thread = threading.Thread(target=_audit_writer, name='audit-writer', daemon=True)
+            _audit_writer_thread.start()
+
+def wait_for_audit_writes(timeout=None):
+    """Block until every queued audit event has been written, or timeout expires"""
+    _ensure_audit_writer()
+    return _wait_for_queue(AUDIT_Q, timeout)
+
+def log_audit_event(user_id, event_type, action, resource_type=None, resource_id=None, details=None,
+                    organization_id=None):
+    """Log audit events for compliance"""
+    try:
+        in_request = has_request_context()
+        timestamp = datetime.datetime.utcnow()
+        row = {
+            'id': uuid.uuid4(),
+            'organization_id': organization_id or (session.get('organization_id') if in_request else None),
+            'user_id': user_id,
+            'event_type': event_type,
+            'action': action,
+            'resource_type': resource_type,
+            'resource_id': str(resource_id) if resource_id is not None else None,
+            'details': details or {},
+            'ip_address': request.remote_addr if in_request else None,
+            'user_agent': request.headers.get('User-Agent') if in_request else None,
+            'session_id': session.get('session_id') if in_request else None,
+            'compliance_relevant': True,
+            'timestamp': timestamp
+        }
+        enqueue_es_action({'_index': 'audit-logs', '_source': {
+            'timestamp': timestamp.isoformat(),
+            'user_id': user_id,
+            'event_type': event_type,
+            'action': action,
+            'resource_type': resource_type,
+            'resource_id': row['resource_id'],
+            'details': details,
+            'ip_address': row['ip_address']
+        }})
+        
+        _ensure_audit_writer()
+        AUDIT_Q.put(row)
+    
     except Exception as e:
         app.logger.error(f"Failed to log audit event: {e}")
 
+@atexit.register
+def _flush_pending_audit_events():
+    """Give the audit writer a chance to finish before the process exits"""
+    if AUDIT_Q.unfinished_tasks and not wait_for_audit_writes(AUDIT_EXIT_TIMEOUT):
+        app.logger.error(f"Exiting with {AUDIT_Q.unfinished_tasks} audit events unwritten")
+
+# Auth decorators only need a few user fields; keep them in Redis briefly
+USER_CACHE_TTL = 300  # seconds
+
+def _user_cache_key(user_id):
+    return f"user:{user_id}:profile"
+
+def _get_cached_user(user_id):
+    """Get the id, status, role and organization of a user, cached in Redis"""
+    key = _user_cache_key(user_id)
+    if redis_client:
+        try:
+            raw = redis_client.get(key)
+            if raw:
+                profile = json.loads(raw)
+                profile['id'] = uuid.UUID(profile['id'])
+                profile['organization_id'] = uuid.UUID(profile['organization_id'])
+                return profile
+        except redis.RedisError as e:
+            app.logger.warning(f"User cache read failed: {e}")
+    
+    user = User.query.get(user_id)
+    if not user:
+        return None
+    
+    profile = {
+        'id': user.id,
+        'status': user.status,
+        'role': user.role,
+        'organization_id': user.organization_id
+    }
+    if redis_client:
+        try:
+            redis_client.setex(key, USER_CACHE_TTL, json.dumps(profile, default=str))
+        except redis.RedisError as e:
+            app.logger.warning(f"User cache write failed: {e}")
+    return profile
+
+def invalidate_cached_user(user_id):
+    """Drop a user's cached profile after the row changes"""
+    if redis_client:
+        try:
+            redis_client.delete(_user_cache_key(user_id))
+        except redis.RedisError as e:
+            app.logger.warning(f"User cache invalidation failed: {e}")
+
+@app.before_request
+def upgrade_legacy_session_ids():
+    """Sessions issued before keys were UUIDs hold them as strings"""
+    for key in ('user_id', 'organization_id'):
+        if isinstance(session.get(key), str):
+            try:
+                session[key] = uuid.UUID(session[key])
+            except ValueError:
+                session.clear()
+                return
+
 def requires_auth(f):
     """Enhanced authentication decorator"""
     @wraps(f)
@@ -556,8 +1330,8 @@ def requires_auth(f):
             return redirect(url_for('login'))
         
         # Check if user is still active
-        user = User.query.get(session['user_id'])
-        if not user or user.status != 'active':
+        user = _get_cached_user(session['user_id'])
+        if not user or user['status'] != 'active':
             session.clear()
             if request.is_json:
                 return jsonify({'error': 'Account inactive'}), 401
@@ -569,29 +1343,22 @@ def requires_auth(f):
 
 def requires_role(required_role):
     """Role-based access control decorator"""
+    required_level = _ROLE_RANK.get(required_role, 99)
+    
     def decorator(f):
         @wraps(f)
         def decorated_function(*args, **kwargs):
             if 'user_id' not in session:
                 return jsonify({'error': 'Authentication required'}), 401
             
-            user = User.query.get(session['user_id'])
+            user = _get_cached_user(session['user_id'])
             if not user:
                 return jsonify({'error': 'User not found'}), 401
             
-            role_hierarchy = {
-                'user': 0,
-                'manager': 1,
-                'admin': 2,
-                'super_admin': 3
-            }
-            
-            user_level = role_hierarchy.get(user.role, 0)
-            required_level = role_hierarchy.get(required_role, 99)
-            
+            user_level = _ROLE_RANK.get(user['role'], 0)
             if user_level < required_level:
-                log_audit_event(user.id, 'access_denied', 'insufficient_role', 
-                              details={'required_role': required_role, 'user_role': user.role})
+                log_audit_event(user['id'], 'access_denied', 'insufficient_role', 
+                              details={'required_role': required_role, 'user_role': user['role']})
                 return jsonify({'error': 'Insufficient permissions'}), 403
             
             return f(*args, **kwargs)
@@ -599,88 +1366,268 @@ def requires_role(required_role):
     return decorator
 
 # Background Tasks
+# File types whose text content is extracted and indexed
+TEXT_EXTRACTABLE_TYPES = frozenset({'pdf', 'doc', 'docx', 'txt', 'rtf'})
+CONTENT_INDEX_BATCH_SIZE = 50
+
+def _extract_text(file_path):
+    """Extract plain text from a document"""
+    # textract pulls in every parser backend, so only workers that extract pay for it
+    import textract
+    return textract.process(file_path).decode('utf-8')
+
 @celery.task
-def process_file_content(file_id):
-    """Extract and index file content"""
+def process_file_content(file_ids):
+    """Extract and index file content for a batch of files"""
     try:
-        file_meta = FileMetadata.query.get(file_id)
-        if not file_meta:
-            return {'error': 'File not found'}
+        files = FileMetadata.query.filter(FileMetadata.id.in_(file_ids)).all()
+        if len(files) < len(file_ids):
+            app.logger.warning(f"{len(file_ids) - len(files)} files not found for content processing")
         
-        # Extract text content based on file type
-        content = ""
-        try:
-            if file_meta.file_type.lower() in ['pdf', 'doc', 'docx', 'txt', 'rtf']:
-                content = textract.process(file_meta.file_path).decode('utf-8')
-        except Exception as e:
-            app.logger.warning(f"Failed to extract content from {file_meta.name}: {e}")
+        # Extract text content based on file type; textract shells out to
+        # pdftotext/antiword, so threads are enough to overlap the extractions
+        contents = {}
+        extractable = [f for f in files if f.file_type in TEXT_EXTRACTABLE_TYPES]
+        if extractable:
+            with ThreadPoolExecutor(max_workers=min(len(extractable), os.cpu_count() or 1)) as pool:
+                futures = {pool.submit(_extract_text, f.file_path): f for f in extractable}
+                for future in as_completed(futures):
+                    file_meta = futures[future]
+                    try:
+                        contents[file_meta.id] = future.result()
+                    except Exception as e:
+                        app.logger.warning(f"Failed to extract content from {file_meta.name}: {e}")
         
-        # Index in Elasticsearch
-        if es and content:
-            try:
-                es.index(
-                    index='file-content',
-                    id=file_id,
-                    body={
-                        'file_id': file_id,
+        # Index in Elasticsearch inline: the task is already off the request
+        # path, and a worker child's in-memory queue would not outlive it
+        indexed = 0
+        failures = []
+        if es:
+            actions = (
+                {
+                    '_op_type': 'index',
+                    '_index': 'file-content',
+                    '_id': file_meta.id,
+                    '_source': {
+                        'file_id': file_meta.id,
                         'organization_id': file_meta.organization_id,
                         'name': file_meta.name,
-                        'content': content,
+                        'content': contents[file_meta.id],
                         'file_type': file_meta.file_type,
                         'classification': file_meta.classification,
                         'tags': file_meta.tags,
                         'created_at': file_meta.created_at.isoformat(),
                         'created_by': file_meta.created_by_id
                     }
-                )
-            except Exception as e:
-                app.logger.error(f"Failed to index file content: {e}")
+                }
+                for file_meta in files if contents.get(file_meta.id)
+            )
+            for ok, info in helpers.streaming_bulk(es, actions, chunk_size=200,
+                                                   max_chunk_bytes=20 * 1024 * 1024,
+                                                   raise_on_error=False):
+                if ok:
+                    indexed += 1
+                else:
+                    result = info.get('index', {})
+                    failures.append({'file_id': str(result.get('_id')), 'error': result.get('error')})
+                    app.logger.error(f"Failed to index file content: {info}")
         
-        return {'status': 'completed', 'content_length': len(content)}
+        return {'status': 'completed', 'processed': len(files), 'indexed': indexed, 'failed': failures}
     
     except Exception as e:
-        app.logger.error(f"Error processing file {file_id}: {e}")
+        app.logger.error(f"Error processing files {file_ids}: {e}")
         return {'error': str(e)}
 
+RETENTION_BATCH_SIZE = 1000
+_SECURE_DELETE_CLASSIFICATIONS = frozenset({'confidential', 'restricted'})
+
+def _remove_file(file_path):
+    """Remove a file from disk, returning the error instead of raising it"""
+    try:
+        os.remove(file_path)
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        return e
+    return None
+
 @celery.task
 def apply_retention_policies():
     """Apply data retention policies"""
     try:
-        # Find files that should be deleted based on retention policy
-        cutoff_date = datetime.datetime.utcnow() - datetime.timedelta(days=app.config['RETENTION_POLICY_DAYS'])
+        now = datetime.datetime.utcnow()
+        processed = 0
+        organization_ids = set()
+        last_id = None
         
-        expired_files = FileMetadata.query.filter(
-            FileMetadata.retention_until < datetime.datetime.utcnow(),
-            FileMetadata.legal_hold == False
-        ).all()
-        
-        for file_meta in expired_files:
-            try:
-                # Move to archive or delete based on classification
-                if file_meta.classification in ['confidential', 'restricted']:
-                    # Secure deletion
-                    if os.path.exists(file_meta.file_path):
-                        os.remove(file_meta.file_path)
+        with ThreadPoolExecutor(max_workers=16) as unlink_pool:
+            while True:
+                # Walk expired files in id order, one batch at a time
+                query = db.session.query(
+                    FileMetadata.id, FileMetadata.organization_id, FileMetadata.name,
+                    FileMetadata.file_path, FileMetadata.classification
+                ).filter(
+                    FileMetadata.retention_until < now,
+                    FileMetadata.legal_hold == False
+                )
+                if last_id is not None:
+                    query = query.filter(FileMetadata.id > last_id)
+                batch = query.order_by(FileMetadata.id).limit(RETENTION_BATCH_SIZE).all()
+                if not batch:
+                    break
+                last_id = batch[-1].id
                 
-                # Log deletion
-                log_audit_event(None, 'data_retention', 'file_deleted', 
-                              'file', file_meta.id, 
-                              {'reason': 'retention_policy', 'file_name': file_meta.name})
+                # Secure deletion for confidential and restricted files
+                secure = [f for f in batch if f.classification in _SECURE_DELETE_CLASSIFICATIONS]
+                failed = set()
+                for f, error in zip(secure, unlink_pool.map(_remove_file, [f.file_path for f in secure])):
+                    if error:
+                        app.logger.error(f"Failed to delete expired file {f.id}: {error}")
+                        failed.add(f.id)
                 
-                db.session.delete(file_meta)
-            
-            except Exception as e:
-                app.logger.error(f"Failed to delete expired file {file_meta.id}: {e}")
+                expired = [f for f in batch if f.id not in failed]
+                ids = [f.id for f in expired]
+                if not ids:
+                    continue
+                
+                try:
+                    db.session.execute(FilePermission.__table__.delete().where(FilePermission.file_id.in_(ids)))
+                    db.session.execute(FileShare.__table__.delete().where(FileShare.file_id.in_(ids)))
+                    db.session.execute(FileComment.__table__.delete().where(FileComment.file_id.in_(ids)))
+                    db.session.execute(FileMetadata.__table__.update().where(
+                        FileMetadata.parent_folder_id.in_(ids)).values(parent_folder_id=None))
+                    db.session.execute(FileMetadata.__table__.update().where(
+                        FileMetadata.parent_version_id.in_(ids)).values(parent_version_id=None))
+                    db.session.execute(FileMetadata.__table__.delete().where(FileMetadata.id.in_(ids)))
+                    db.session.commit()
+                except Exception as e:
+                    db.session.rollback()
+                    app.logger.error(f"Failed to delete {len(ids)} expired files: {e}")
+                    continue
+                
+                # Log deletion
+                for f in expired:
+                    log_audit_event(None, 'data_retention', 'file_deleted',
+                                  'file', f.id,
+                                  {'reason': 'retention_policy', 'file_name': f.name},
+                                  organization_id=f.organization_id)
+                    organization_ids.add(f.organization_id)
+                processed += len(expired)
         
-        db.session.commit()
-        return {'processed': len(expired_files)}
+        wait_for_audit_writes()
+        wait_for_es_indexing()
+        
+        for organization_id in organization_ids:
+            cache.delete_memoized(_org_analytics, organization_id)
+        return {'processed': processed}
     
     except Exception as e:
+        db.session.rollback()
         app.logger.error(f"Error in retention policy task: {e}")
         return {'error': str(e)}
 
+def _month_start(moment, offset=0):
+    """First instant of the month `offset` months away from `moment`"""
+    month = moment.month - 1 + offset
+    return datetime.datetime(moment.year + month // 12, month % 12 + 1, 1)
+
+def ensure_audit_partitions(now=None):
+    """Create the default and the current and next monthly audit_logs partitions
+    
+    Months are created as plain tables, filled with any of their rows that
+    landed in the default partition, then attached. Returns the new partitions;
+    the caller commits.
+    """
+    now = now or datetime.datetime.utcnow()
+    db.session.execute(db.text(
+        f"CREATE TABLE IF NOT EXISTS {AUDIT_DEFAULT_PARTITION} PARTITION OF audit_logs DEFAULT"
+    ))
+    created = []
+    for offset in (0, 1):
+        start, end = _month_start(now, offset), _month_start(now, offset + 1)
+        name = f"audit_logs_{start:%Y_%m}"
+        if db.session.execute(db.text("SELECT to_regclass(:name)"), {'name': name}).scalar():
+            continue
+        db.session.execute(db.text(
+            f"CREATE TABLE {name} (LIKE audit_logs INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"
+        ))
+        db.session.execute(db.text(
+            f"WITH moved AS (DELETE FROM {AUDIT_DEFAULT_PARTITION} "
+            f"WHERE timestamp >= :start AND timestamp < :end RETURNING *) "
+            f"INSERT INTO {name} SELECT * FROM moved"
+        ), {'start': start, 'end': end})
+        db.session.execute(db.text(
+            f"ALTER TABLE audit_logs ATTACH PARTITION {name} "
+            f"FOR VALUES FROM ('{start:%Y-%m-%d}') TO ('{end:%Y-%m-%d}')"
+        ))
+        created.append(name)
+    return created
+
+@celery.task
+def maintain_audit_partitions():
+    """Create upcoming monthly audit_logs partitions and detach expired ones"""
+    if db.engine.dialect.name != 'postgresql':
+        return {'skipped': 'audit_logs is only partitioned on PostgreSQL'}
+    
+    try:
+        now = datetime.datetime.utcnow()
+        created = ensure_audit_partitions(now)
+        
+        # Detach (not drop) partitions that ended before the retention cutoff so they can be archived
+        cutoff = now - datetime.timedelta(days=app.config['AUDIT_LOG_RETENTION_DAYS'])
+        partitions = db.session.execute(db.text(
+            "SELECT child.relname FROM pg_inherits "
+            "JOIN pg_class parent ON pg_inherits.inhparent = parent.oid "
+            "JOIN pg_class child ON pg_inherits.inhrelid = child.oid "
+            "WHERE parent.relname = 'audit_logs'"
+        )).scalars().all()
+        detached = []
+        for name in partitions:
+            try:
+                start = datetime.datetime.strptime(name, 'audit_logs_%Y_%m')
+            except ValueError:
+                continue
+            if _month_start(start, 1) <= cutoff:
+                db.session.execute(db.text(f"ALTER TABLE audit_logs DETACH PARTITION {name}"))
+                detached.append(name)
+        
+        db.session.commit()
+        return {'created': created, 'detached': detached}
+    
+    except Exception as e:
+        db.session.rollback()
+        app.logger.error(f"Error maintaining audit log partitions: {e}")
+        return {'error': str(e)}
+
+celery.conf.beat_schedule = {
+    'maintain-audit-partitions': {
+        'task': maintain_audit_partitions.name,
+        'schedule': datetime.timedelta(days=1)
+    }
+}
+
 # Routes
 
+@cache.memoize(timeout=60)
+def _org_analytics(organization_id):
+    """Dashboard analytics for an organization, cached for a minute"""
+    week_ago = datetime.datetime.utcnow() - datetime.timedelta(days=7)
+    total_files, total_size, uploads_this_week = db.session.query(
+        db.func.count(FileMetadata.id),
+        db.func.coalesce(db.func.sum(FileMetadata.size), 0),
+        db.func.coalesce(db.func.sum(db.case((FileMetadata.created_at >= week_ago, 1), else_=0)), 0)
+    ).filter(
+        FileMetadata.organization_id == organization_id,
+        FileMetadata.is_folder == False
+    ).one()
+    
+    return {
+        'total_files': total_files,
+        'total_size': total_size,
+        'uploads_this_week': uploads_this_week,
+        'total_users': User.query.filter_by(organization_id=organization_id).count()
+    }
+
 @app.route('/')
 @requires_auth
 def index():
@@ -688,38 +1635,28 @@ def index():
     user = User.query.get(session['user_id'])
     
     # Get user's accessible files
+    dashboard_columns = load_only(FileMetadata.id, FileMetadata.name, FileMetadata.size,
+                                  FileMetadata.updated_at, FileMetadata.file_type)
     if user.is_admin:
         files = FileMetadata.query.filter_by(
             organization_id=session['organization_id'],
             is_folder=False
-        ).order_by(FileMetadata.updated_at.desc()).limit(50).all()
+        ).options(dashboard_columns).order_by(FileMetadata.updated_at.desc()).limit(50).all()
     else:
         # Files user has permission to or created
-        files = db.session.query(FileMetadata).join(FilePermission).filter(
+        permitted_ids = db.session.query(FilePermission.file_id).filter(
+            FilePermission.user_id == user.id
+        ).subquery()
+        files = FileMetadata.query.filter(
             FileMetadata.organization_id == session['organization_id'],
             FileMetadata.is_folder == False,
             db.or_(
-                FilePermission.user_id == user.id,
+                FileMetadata.id.in_(db.select(permitted_ids.c.file_id)),
                 FileMetadata.created_by_id == user.id
             )
-        ).order_by(FileMetadata.updated_at.desc()).limit(50).all()
+        ).options(dashboard_columns).order_by(FileMetadata.updated_at.desc()).limit(50).all()
     
-    # Analytics data
-    analytics = {
-        'total_files': FileMetadata.query.filter_by(
-            organization_id=session['organization_id'], 
-            is_folder=False
-        ).count(),
-        'total_size': db.session.query(db.func.sum(FileMetadata.size)).filter_by(
-            organization_id=session['organization_id'],
-            is_folder=False
-        ).scalar() or 0,
-        'uploads_this_week': FileMetadata.query.filter(
-            FileMetadata.organization_id == session['organization_id'],
-            FileMetadata.created_at >= datetime.datetime.utcnow() - datetime.timedelta(days=7)
-        ).count(),
-        'total_users': User.query.filter_by(organization_id=session['organization_id']).count()
-    }
+    analytics = _org_analytics(session['organization_id'])
     
     return render_template('index.html', 
                          files=files, 
@@ -745,7 +1682,8 @@ def login():
             if user.two_factor_enabled:
                 if not form.totp_code.data or not user.verify_totp(form.totp_code.data):
                     flash('Invalid 2FA code.', 'error')
-                    log_audit_event(user.id, 'authentication', 'login_failed_2fa')
+                    log_audit_event(user.id, 'authentication', 'login_failed_2fa',
+                                  organization_id=user.organization_id)
                     return render_template('login.html', form=form)
             
             # Reset failed attempts
@@ -760,6 +1698,7 @@ def login():
             session.permanent = form.remember_me.data
             
             db.session.commit()
+            invalidate_cached_user(user.id)
             
             log_audit_event(user.id, 'authentication', 'login_success')
             flash(f'Welcome back, {user.display_name}!', 'success')
@@ -772,7 +1711,9 @@ def login():
                 if user.failed_login_attempts >= 5:
                     user.locked_until = datetime.datetime.utcnow() + datetime.timedelta(minutes=30)
                 db.session.commit()
-                log_audit_event(user.id if user else None, 'authentication', 'login_failed')
+                invalidate_cached_user(user.id)
+                log_audit_event(user.id, 'authentication', 'login_failed',
+                              organization_id=user.organization_id)
             
             flash('Invalid username or password.', 'error')
     
@@ -804,84 +1745,81 @@ def upload_file():
         category = request.form.get('category', '')
         tags = request.form.get('tags', '').split(',') if request.form.get('tags') else []
         
-        uploaded_files = []
-        
-        for file in files:
-            if file.filename == '':
-                continue
-            
+        uploads = [file for file in files if file.filename != '']
+        for file in uploads:
             if not allowed_file(file.filename):
                 return jsonify({'error': f'File type not allowed: {file.filename}'}), 400
-            
-            # Generate secure filename
-            original_name = file.filename
-            secure_name = secure_filename(original_name)
-            file_id = str(uuid.uuid4())
-            file_extension = secure_name.rsplit('.', 1)[1].lower() if '.' in secure_name else ''
-            stored_filename = f"{file_id}.{file_extension}"
-            
+        
+        # Save and hash files in parallel; the database work stays on this thread
+        upload_path = os.path.join(app.config['UPLOAD_FOLDER'], folder_path.strip('/'))
+        stored = []
+        if uploads:
             # Create folder structure
-            upload_path = os.path.join(app.config['UPLOAD_FOLDER'], folder_path.strip('/'))
             os.makedirs(upload_path, exist_ok=True)
-            
-            file_path = os.path.join(upload_path, stored_filename)
-            
-            # Save file
-            file.save(file_path)
-            
-            # Calculate file properties
-            file_size = os.path.getsize(file_path)
-            mime_type = mimetypes.guess_type(file_path)[0] or 'application/octet-stream'
-            
+            with ThreadPoolExecutor(max_workers=min(UPLOAD_WORKERS, len(uploads))) as pool:
+                futures = [pool.submit(_process_single_upload, file, upload_path, file_id)
+                           for file, file_id in zip(uploads, _batch_uuid4(len(uploads)))]
+            errors = [future.exception() for future in futures if future.exception()]
+            stored = [future.result() for future in futures if not future.exception()]
+            if errors:
+                _discard_stored_uploads(stored)
+                raise errors[0]
+            _link_duplicate_uploads(stored, session['organization_id'])
+        
+        # Set retention policy; the same for every file in the batch
+        retention_days = app.config.get('RETENTION_POLICY_DAYS', 2555)
+        retention_until = datetime.datetime.utcnow() + datetime.timedelta(days=retention_days)
+        
+        metas = []
+        permissions = []
+        for item in stored:
             # Create metadata record
             file_meta = FileMetadata(
-                id=file_id,
                 organization_id=session['organization_id'],
-                name=secure_name,
-                original_name=original_name,
-                file_path=file_path,
-                file_type=file_extension,
-                mime_type=mime_type,
-                size=file_size,
-                checksum='',  # Will be calculated
                 folder_path=folder_path,
                 classification=classification,
                 category=category,
                 tags=tags,
-                created_by_id=user.id
+                created_by_id=user.id,
+                retention_until=retention_until,
+                **item
             )
-            
-            # Calculate checksum
-            file_meta.checksum = file_meta.calculate_checksum(file_path)
-            
-            # Set retention policy
-            retention_days = app.config.get('RETENTION_POLICY_DAYS', 2555)
-            file_meta.retention_until = datetime.datetime.utcnow() + datetime.timedelta(days=retention_days)
-            
-            db.session.add(file_meta)
-            db.session.commit()
+            metas.append(file_meta)
             
             # Grant creator full permissions
-            permission = FilePermission(
-                file_id=file_meta.id,
-                user_id=user.id,
-                can_read=True,
-                can_write=True,
-                can_delete=True,
-                can_share=True,
-                can_admin=True,
-                granted_by_id=user.id
-            )
-            db.session.add(permission)
+            permissions.append({
+                'file_id': file_meta.id,
+                'user_id': user.id,
+                'can_read': True,
+                'can_write': True,
+                'can_delete': True,
+                'can_share': True,
+                'can_admin': True,
+                'granted_by_id': user.id
+            })
+        
+        # One transaction for the whole batch; nothing is kept if it fails.
+        # Files are flushed first so the permission rows can reference them.
+        try:
+            db.session.add_all(metas)
+            db.session.flush()
+            bulk_copy(FilePermission.__table__, permissions, UPLOAD_PERMISSION_COLUMNS)
             db.session.commit()
-            
-            # Background processing
-            process_file_content.delay(file_meta.id)
+        except Exception:
+            db.session.rollback()
+            _discard_stored_uploads(stored)
+            raise
+        
+        uploaded_files = []
+        extractable_ids = []
+        for file_meta in metas:
+            if file_meta.file_type in TEXT_EXTRACTABLE_TYPES:
+                extractable_ids.append(file_meta.id)
             
             # Log upload
             log_audit_event(user.id, 'file_management', 'file_uploaded', 
                           'file', file_meta.id, 
-                          {'file_name': original_name, 'file_size': file_size})
+                          {'file_name': file_meta.original_name, 'file_size': file_meta.size})
             
             uploaded_files.append({
                 'id': file_meta.id,
@@ -890,6 +1828,18 @@ def upload_file():
                 'type': file_meta.file_type
             })
         
+        if metas:
+            cache.delete_memoized(_org_analytics, session['organization_id'])
+        
+        # Background processing, only for files with text to extract; one
+        # publish for the whole batch
+        batches = [extractable_ids[i:i + CONTENT_INDEX_BATCH_SIZE]
+                   for i in range(0, len(extractable_ids), CONTENT_INDEX_BATCH_SIZE)]
+        if len(batches) == 1:
+            process_file_content.delay(batches[0])
+        elif batches:
+            group(process_file_content.s(batch) for batch in batches).apply_async()
+        
         return jsonify({
             'message': f'Successfully uploaded {len(uploaded_files)} files',
             'files': uploaded_files
@@ -899,9 +1849,71 @@ def upload_file():
         app.logger.error(f"Upload error: {e}")
         return jsonify({'error': 'Upload failed'}), 500
 
+@app.cli.command('convert-uuid-keys')
+def convert_uuid_keys():
+    """Convert key columns holding dashed UUID strings to the storage db.Uuid expects
+    
+    Run once on databases created when keys were String(36). PostgreSQL columns
+    are altered to the native uuid type, with the foreign keys between them
+    dropped and recreated around it. Other dialects (SQLite) store db.Uuid as
+    32-character hex, so the dashed values are rewritten in place. Safe to rerun.
+    """
+    with db.engine.begin() as conn:
+        inspector = inspect(conn)
+        quote = conn.dialect.identifier_preparer.quote
+        existing = set(inspector.get_table_names())
+        pending = []
+        for table in db.metadata.sorted_tables:
+            if table.name not in existing:
+                continue
+            stored_types = {column['name']: column['type'] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if (isinstance(column.type, db.Uuid) and column.name in stored_types
+                        and not isinstance(stored_types[column.name], db.Uuid)):
+                    pending.append((table.name, column.name))
+        
+        if conn.dialect.name != 'postgresql':
+            for table_name, column_name in pending:
+                column = quote(column_name)
+                result = conn.execute(db.text(
+                    f"UPDATE {quote(table_name)} SET {column} = lower(replace({column}, '-', '')) "
+                    f"WHERE {column} LIKE '%-%'"
+                ))
+                click.echo(f"{table_name}.{column_name}: {result.rowcount} rows rewritten")
+            return
+        
+        # PostgreSQL refuses foreign keys between text and uuid columns, so
+        # every constraint touching a converted column is rebuilt afterwards
+        converting = set(pending)
+        foreign_keys = []
+        for table_name in existing:
+            for fk in inspector.get_foreign_keys(table_name):
+                if any((table_name, c) in converting for c in fk['constrained_columns']) or \
+                        any((fk['referred_table'], c) in converting for c in fk['referred_columns']):
+                    foreign_keys.append((table_name, fk))
+        for table_name, fk in foreign_keys:
+            conn.execute(db.text(f"ALTER TABLE {quote(table_name)} DROP CONSTRAINT {quote(fk['name'])}"))
+        for table_name, column_name in pending:
+            column = quote(column_name)
+            conn.execute(db.text(
+                f"ALTER TABLE {quote(table_name)} ALTER COLUMN {column} TYPE uuid USING {column}::uuid"
+            ))
+            click.echo(f"{table_name}.{column_name}: converted to uuid")
+        for table_name, fk in foreign_keys:
+            options = fk.get('options', {})
+            actions = ''.join(f" ON {action.upper()} {options[f'on{action}']}"
+                              for action in ('delete', 'update') if options.get(f'on{action}'))
+            conn.execute(db.text(
+                f"ALTER TABLE {quote(table_name)} ADD CONSTRAINT {quote(fk['name'])} "
+                f"FOREIGN KEY ({', '.join(map(quote, fk['constrained_columns']))}) "
+                f"REFERENCES {quote(fk['referred_table'])} ({', '.join(map(quote, fk['referred_columns']))})"
+                f"{actions}"
+            ))
+
 if __name__ == '__main__':
     with app.app_context():
         db.create_all()
+        maintain_audit_partitions()
         
         # Create default organization if not exists
         if not Organization.query.first():
@@ -34,7 +34,7 @@ class Settings(BaseSettings):
     # File storage
     upload_dir: Path = Path("./uploads")
     max_file_size: int = 50 * 1024 * 1024  # 50MB
-    allowed_extensions: set[str] = {
+    allowed_extensions: frozenset[str] = frozenset({
         # Documents
         ".pdf", ".doc", ".docx", ".xls", ".xlsx", ".ppt", ".pptx",
         ".txt", ".rtf", ".odt", ".ods", ".odp",
@@ -50,7 +50,7 @@ class Settings(BaseSettings):
         # Media
         ".mp4", ".avi", ".mkv", ".mov", ".wmv", ".flv",
         ".mp3", ".wav", ".flac", ".aac", ".ogg",
-    }
+    })
     
     # CORS
     cors_origins: list[str] = ["*"]
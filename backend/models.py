@@ -9,7 +9,7 @@ from sqlalchemy import (
 )
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship, declarative_base
-from sqlalchemy.sql import func
+from sqlalchemy.sql import func, text
 import uuid
 import enum
 
@@ -123,7 +123,7 @@ class File(Base):
     uploaded_by = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False)
     description = Column(Text)
     tags = Column(JSON, default=list)
-    metadata = Column(JSON, default=dict)  # Additional metadata
+    extra_metadata = Column("metadata", JSON, default=dict)  # Additional metadata ("metadata" is reserved)
     
     # Version control
     version = Column(Integer, default=1, nullable=False)
@@ -145,7 +145,8 @@ class File(Base):
     __table_args__ = (
         Index("idx_file_project", "project_id"),
         Index("idx_file_uploader", "uploaded_by"),
-        Index("idx_file_active", "is_active"),
+        # Queries almost always filter on active files; inactive rows stay out of the index
+        Index("idx_file_active_partial", "project_id", "created_at", postgresql_where=text("is_active")),
         Index("idx_file_hash", "hash"),
     )
     
@@ -267,7 +268,7 @@ class ShareLink(Base):
     __table_args__ = (
         Index("idx_share_link_token", "token"),
         Index("idx_share_link_file", "file_id"),
-        Index("idx_share_link_active", "is_active"),
+        Index("idx_share_link_active_partial", "file_id", "expires_at", postgresql_where=text("is_active")),
     )
     
     def __repr__(self):
@@ -0,0 +1,40 @@
+"""
+Shared query statements for FileFlowMaster
+
+Relationships on the models use the default lazy="select", so touching one
+per row in a listing issues a query per file. Start listing queries from
+these statements instead: each selectinload adds a single
+SELECT ... WHERE <fk> IN (...) for the whole page of files.
+
+Eagerly loaded for listings:
+    File.uploader      - shown next to every file
+    File.permissions   - needed to decide what each row allows
+
+Left lazy (only load them for a single file, e.g. via file_detail_query):
+    File.versions      - history can be long and is only shown on the detail view
+    File.share_links   - only needed when managing sharing
+    File.project       - listings are already scoped to one project
+"""
+import uuid
+
+from sqlalchemy import Select, select
+from sqlalchemy.orm import selectinload
+
+from models import File
+
+
+# Statements are immutable, so these can be shared and extended with .where()
+file_query: Select = select(File).options(
+    selectinload(File.uploader),
+    selectinload(File.permissions),
+)
+
+active_file_query: Select = file_query.where(File.is_active)
+
+
+def file_detail_query(file_id: uuid.UUID) -> Select:
+    """Single file with everything the detail view renders"""
+    return file_query.where(File.id == file_id).options(
+        selectinload(File.versions),
+        selectinload(File.share_links),
+    )